@@ -3,27 +3,93 @@ GenVis Agent Backend
 Handles multi-step reasoning workflows for Product Manager tasks
 """
 
+import asyncio
+import hashlib
 import json
 import logging
 import os
 import re
+import time
+from collections import deque
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from string import Template
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
 
-import requests
+import orjson
+from cachetools import TTLCache
 from dotenv import load_dotenv
+from pydantic import BaseModel
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 
 # load enviorment
 load_dotenv()
 
-# setup logging
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
 # nvidia config
 NVIDIA_API_KEY = os.getenv("NVIDIA_API_KEY")
 NVIDIA_API_BASE = os.getenv("NVIDIA_API_BASE", "https://integrate.api.nvidia.com/v1")
 NVIDIA_MODEL = os.getenv("NVIDIA_MODEL", "nvidia/nvidia-nemotron-nano-9b-v2")
+NVIDIA_MAX_IN_FLIGHT = int(os.getenv("NVIDIA_MAX_IN_FLIGHT", "8"))
+
+# shared client so calls reuse pooled keep-alive connections; created on first
+# use so mock mode never imports httpx
+_http_client = None
+
+
+def _get_http_client():
+    global _http_client
+    if _http_client is None:
+        import httpx
+
+        _http_client = httpx.AsyncClient(
+            base_url=NVIDIA_API_BASE.rstrip("/"),
+            headers={
+                "Authorization": f"Bearer {NVIDIA_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            timeout=45.0,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=60),
+            # parallel calls multiplex over one connection instead of opening new ones
+            http2=True,
+        )
+    return _http_client
+
+
+# exact-match cache of parsed workflow results keyed on (prompt hash, max_tokens).
+# Only output that parsed is stored, and entries expire so a weak generation
+# isn't served forever.
+_RESPONSE_CACHE_SIZE = 512
+_RESPONSE_CACHE_TTL = 3600
+_response_cache: TTLCache = TTLCache(maxsize=_RESPONSE_CACHE_SIZE, ttl=_RESPONSE_CACHE_TTL)
+
+
+def _cache_key(prompt: str, max_tokens: int) -> str:
+    return f"{hashlib.blake2b(prompt.encode('utf-8')).hexdigest()}:{max_tokens}"
+
+
+async def warm_up_http_client() -> None:
+    """Opens the pooled connection (DNS/TCP/TLS) with a 1-token completion at startup."""
+    if not NVIDIA_API_KEY:
+        return
+    payload = {
+        "model": NVIDIA_MODEL,
+        "messages": [{"role": "user", "content": "ping"}],
+        "max_tokens": 1,
+    }
+    try:
+        await _get_http_client().post("/chat/completions", json=payload, timeout=10.0)
+        logger.info("Nemotron client warmed up.")
+    except Exception as exc:
+        logger.warning("Nemotron warm-up failed: %s", exc)
+
+
+async def close_http_client() -> None:
+    """Closes the pooled Nemotron client on app shutdown."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
 
 
 def _mock_ai_response(prompt: str) -> Dict[str, Any]:
@@ -39,68 +105,283 @@ def _mock_ai_response(prompt: str) -> Dict[str, Any]:
     }
 
 
-def nemotron_generate(prompt: str, max_tokens: int = 1500) -> Dict[str, Any]:
-    """Calls NVIDIA’s hosted LLM (Nemotron). Falls back if no key or network fails."""
-    if not NVIDIA_API_KEY:
-        return _mock_ai_response(prompt)
+DEFAULT_SYSTEM_PROMPT = "You are GenVis, an expert AI Product Manager."
 
-    url = f"{NVIDIA_API_BASE.rstrip('/')}/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {NVIDIA_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    payload = {
+
+def _build_payload(
+    prompt: str,
+    max_tokens: int,
+    system: str = DEFAULT_SYSTEM_PROMPT,
+    schema: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    # with a schema the decoder is constrained to it, so output always parses
+    if schema is not None:
+        response_format = {
+            "type": "json_schema",
+            "json_schema": {"name": schema.get("title", "response"), "schema": schema},
+        }
+    else:
+        response_format = {"type": "json_object"}
+    return {
         "model": NVIDIA_MODEL,
         "messages": [
-            {"role": "system", "content": "You are GenVis, an expert AI Product Manager."},
+            {"role": "system", "content": system},
             {"role": "user", "content": prompt},
         ],
         "temperature": 0.3,
         "max_tokens": max_tokens,
-        "response_format": {"type": "json_object"},
+        "response_format": response_format,
     }
 
+
+def _is_retryable(exc: BaseException) -> bool:
+    """Retry rate limits, server errors and failed connects; not timeouts or 4xx."""
+    import httpx
+
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, httpx.ConnectError)
+
+
+class NemotronUnavailableError(RuntimeError):
+    """Nemotron could not be reached or kept failing after retries."""
+
+
+class CircuitOpenError(NemotronUnavailableError):
+    """The circuit breaker is open, so the call was not attempted."""
+
+
+class CircuitBreaker:
+    """Opens after repeated failures so callers skip the API.
+
+    Once reset_timeout has passed, exactly one trial call is let through; every
+    other caller keeps short-circuiting until that trial succeeds (closing the
+    circuit) or fails (re-opening it).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> Tuple[bool, bool]:
+        """Returns (allowed, took_trial); only the trial holder may release the slot."""
+        state = self.state
+        if state == "closed":
+            return True, False
+        if state == "open" or self.trial_in_flight:
+            return False, False
+        self.trial_in_flight = True
+        return True, True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self, trial: bool = False) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        if trial:
+            self.trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Frees the half-open slot when the trial call is abandoned without an outcome."""
+        self.trial_in_flight = False
+
+
+_breaker = CircuitBreaker()
+_llm_stats = {"success": 0, "fail": 0, "circuit_open": 0}
+
+
+def get_llm_stats() -> Dict[str, Any]:
+    """Nemotron call counters and circuit state for the activity endpoint."""
+    return {**_llm_stats, "circuit": _breaker.state}
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=0.5, max=5),
+    retry=retry_if_exception(_is_retryable),
+    reraise=True,
+)
+async def _request_completion(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Sends one chat completion request and normalizes the reply. Raises on failure."""
+    response = await _get_http_client().post("/chat/completions", json=payload)
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    message = data["choices"][0].get("message", {})
+
+    raw_content = message.get("content", "")
+    if isinstance(raw_content, list):
+        content_parts = []
+        for block in raw_content:
+            if isinstance(block, dict):
+                if block.get("type") in {"output_text", "text"} and "text" in block:
+                    content_parts.append(str(block["text"]))
+                elif "content" in block:
+                    content_parts.append(str(block["content"]))
+            elif isinstance(block, str):
+                content_parts.append(block)
+        content = "".join(content_parts).strip()
+    else:
+        content = str(raw_content or "").strip()
+
+    reasoning = []
+    reasoning_payload = data["choices"][0].get("reasoning") or message.get("reasoning")
+    if reasoning_payload is None and isinstance(raw_content, dict) and "reasoning" in raw_content:
+        reasoning_payload = raw_content["reasoning"]
+    if isinstance(reasoning_payload, list):
+        reasoning = [str(step) for step in reasoning_payload if step]
+    elif isinstance(reasoning_payload, str):
+        reasoning = [reasoning_payload]
+
+    return {
+        "content": content,
+        "reasoning_trace": reasoning or ["Model reasoning successful"],
+    }
+
+
+# caps concurrent upstream requests (plain and streaming) so bursts respect the
+# provider's rate limits; created lazily so it binds to the running event loop
+_upstream_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _upstream_slot() -> asyncio.Semaphore:
+    global _upstream_semaphore
+    if _upstream_semaphore is None:
+        _upstream_semaphore = asyncio.Semaphore(NVIDIA_MAX_IN_FLIGHT)
+    return _upstream_semaphore
+
+
+# cache key -> task for calls currently in flight, so identical concurrent
+# requests share one upstream call instead of each firing their own
+_in_flight: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+
+
+async def _generate_uncached(
+    prompt: str, max_tokens: int, system: str, schema: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    allowed, trial = _breaker.allow()
+    if not allowed:
+        _llm_stats["circuit_open"] += 1
+        logger.warning("Nemotron circuit open; skipping API call.")
+        raise CircuitOpenError("Nemotron is temporarily unavailable (circuit open); retry shortly.")
+
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=45)
-        response.raise_for_status()
-        data = response.json()
-        message = data["choices"][0].get("message", {})
-
-        raw_content = message.get("content", "")
-        if isinstance(raw_content, list):
-            content_parts = []
-            for block in raw_content:
-                if isinstance(block, dict):
-                    if block.get("type") in {"output_text", "text"} and "text" in block:
-                        content_parts.append(str(block["text"]))
-                    elif "content" in block:
-                        content_parts.append(str(block["content"]))
-                elif isinstance(block, str):
-                    content_parts.append(block)
-            content = "".join(content_parts).strip()
-        else:
-            content = str(raw_content or "").strip()
-
-        reasoning = []
-        reasoning_payload = data["choices"][0].get("reasoning") or message.get("reasoning")
-        if reasoning_payload is None and isinstance(raw_content, dict) and "reasoning" in raw_content:
-            reasoning_payload = raw_content["reasoning"]
-        if isinstance(reasoning_payload, list):
-            reasoning = [str(step) for step in reasoning_payload if step]
-        elif isinstance(reasoning_payload, str):
-            reasoning = [reasoning_payload]
-
-        return {
-            "content": content,
-            "reasoning_trace": reasoning or ["Model reasoning successful"],
-        }
+        async with _upstream_slot():
+            result = await _request_completion(_build_payload(prompt, max_tokens, system, schema))
     except Exception as exc:
         logger.error("Nemotron API call failed: %s", exc)
+        _breaker.record_failure(trial)
+        _llm_stats["fail"] += 1
+        raise NemotronUnavailableError(f"Nemotron API call failed: {exc}") from exc
+    except BaseException:
+        if trial:
+            _breaker.release_trial()
+        raise
+
+    _breaker.record_success()
+    _llm_stats["success"] += 1
+    return result
+
+
+async def nemotron_generate(
+    prompt: str,
+    max_tokens: int = 1500,
+    system: str = DEFAULT_SYSTEM_PROMPT,
+    schema: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Calls NVIDIA’s hosted LLM (Nemotron). Falls back to a mock if no key is set.
+
+    Raises NemotronUnavailableError (CircuitOpenError when short-circuited) if
+    the API keeps failing, so callers can tell an outage from bad output.
+    """
+    if not NVIDIA_API_KEY:
         return _mock_ai_response(prompt)
 
+    key = _cache_key(system + prompt, max_tokens)
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_generate_uncached(prompt, max_tokens, system, schema))
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    else:
+        logger.info("Joining in-flight Nemotron call.")
+    # shield so one caller disconnecting doesn't cancel the call for the others
+    return await asyncio.shield(task)
+
+
+async def nemotron_stream(
+    prompt: str,
+    max_tokens: int = 1500,
+    system: str = DEFAULT_SYSTEM_PROMPT,
+    schema: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[str]:
+    """Streams Nemotron content deltas (SSE) as they arrive. Yields mock content if no key.
+
+    Raises if the upstream call fails, so callers can report the real error.
+    """
+    if not NVIDIA_API_KEY:
+        yield _mock_ai_response(prompt)["content"]
+        return
+
+    allowed, trial = _breaker.allow()
+    if not allowed:
+        _llm_stats["circuit_open"] += 1
+        logger.warning("Nemotron circuit open; skipping streaming call.")
+        raise CircuitOpenError("Nemotron is temporarily unavailable (circuit open); retry shortly.")
+
+    payload = _build_payload(prompt, max_tokens, system, schema)
+    payload["stream"] = True
+
+    try:
+        client = _get_http_client()
+        async with _upstream_slot():
+            async with client.stream("POST", "/chat/completions", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = orjson.loads(data).get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+    except Exception as exc:
+        # surface the upstream failure rather than letting the caller parse
+        # whatever partial (often empty) content arrived
+        logger.error("Nemotron streaming call failed: %s", exc)
+        _breaker.record_failure(trial)
+        _llm_stats["fail"] += 1
+        raise NemotronUnavailableError(f"Nemotron streaming call failed: {exc}") from exc
+    except BaseException:
+        # consumer closed the stream (e.g. client disconnect)
+        if trial:
+            _breaker.release_trial()
+        raise
+    else:
+        _breaker.record_success()
+        _llm_stats["success"] += 1
+
 
 CODE_FENCE_PATTERN = re.compile(r"```(?:json)?(.*?)```", re.DOTALL | re.IGNORECASE)
 JSON_TAG_PATTERN = re.compile(r"<json>(.*?)</json>", re.DOTALL | re.IGNORECASE)
+BRACE_PATTERN = re.compile(r"[{}]")
 
 
 def _parse_structured_response(content: str) -> Optional[Dict[str, Any]]:
@@ -108,9 +389,14 @@ def _parse_structured_response(content: str) -> Optional[Dict[str, Any]]:
     if not content:
         return None
 
-    candidates = []
     stripped = content.strip()
-    candidates.append(stripped)
+    # fast path: schema-constrained output is a bare JSON object
+    try:
+        return orjson.loads(stripped)
+    except orjson.JSONDecodeError:
+        pass
+
+    candidates = [stripped]
 
     fence_match = CODE_FENCE_PATTERN.search(content)
     if fence_match:
@@ -120,23 +406,27 @@ def _parse_structured_response(content: str) -> Optional[Dict[str, Any]]:
     if tag_match:
         candidates.append(tag_match.group(1).strip())
 
-    # Extract balanced braces block
+    # Extract balanced braces block (regex skips every non-brace char in C)
     start = -1
     depth = 0
-    for idx, ch in enumerate(content):
-        if ch == "{":
+    for match in BRACE_PATTERN.finditer(content):
+        idx = match.start()
+        if match.group() == "{":
             if depth == 0:
                 start = idx
             depth += 1
-        elif ch == "}":
-            if depth > 0:
-                depth -= 1
-                if depth == 0 and start != -1:
-                    snippet = content[start : idx + 1]
-                    candidates.append(snippet)
-                    start = -1
+        elif depth > 0:
+            depth -= 1
+            if depth == 0 and start != -1:
+                snippet = content[start : idx + 1]
+                candidates.append(snippet)
+                start = -1
 
     for candidate in candidates:
+        try:
+            return orjson.loads(candidate)
+        except orjson.JSONDecodeError:
+            pass
         try:
             return json.loads(candidate)
         except json.JSONDecodeError:
@@ -144,92 +434,301 @@ def _parse_structured_response(content: str) -> Optional[Dict[str, Any]]:
     return None
 
 
+# Static instructions live in the system message so it is byte-identical across
+# calls (provider prefix caching); only the variable context goes in the user
+# message, built from templates compiled once at import. Output keys are short
+# to save generation tokens and are expanded back to the public field names
+# after parsing.
+_IDEATE_SYSTEM = """You are GenVis, an expert AI Product Manager.
+Respond with a single valid JSON object (no markdown, no commentary) containing:
+- rt: 5 detailed steps explaining how you approached the ideation (full sentences)
+- pp: exactly 3 richly written pain point strings (2–3 sentences each). Prefix each with its index like "1. ..."
+- pi: exactly 3 product ideas, objects with name, description (<= 420 chars, emphasize benefits), key_features (array of 4 strings), pain_points_addressed (array of indexes referencing pp, 1-indexed)
+- pe: 3 personas, objects with name, role, goals, frustrations, motivations, preferred_channels
+- mo: market opportunity object with tam, sam, som, cagr, strategic_insight (strings with context)
+Write professional, persuasive copy for the given context."""
+_IDEATE_TMPL = Template('industry="$industry", problem_area="$problem_area"')
+_IDEATE_KEYS = {
+    "rt": "reasoning_trace",
+    "pp": "pain_points",
+    "pi": "product_ideas",
+    "pe": "personas",
+    "mo": "market_opportunity",
+}
+
+_REQUIREMENTS_SYSTEM = """You are GenVis, an expert AI Product Manager generating requirements.
+Respond with a single valid JSON object (no markdown, no commentary) for the given feature and persona containing:
+- rt: 5 concise but descriptive steps (full sentences)
+- us: exactly 3 user stories each containing title, description (<= 280 chars), acceptance_criteria (array of 4 bullet sentences), story_points (number), dependencies (array up to 3 items), business_value (string), risks (string)
+Keep content implementation-ready with clear detail."""
+_REQUIREMENTS_TMPL = Template('feature="$feature_name", persona="$target_persona"')
+_REQUIREMENTS_KEYS = {
+    "rt": "reasoning_trace",
+    "us": "user_stories",
+}
+
+_REPORT_SYSTEM = """You are GenVis, an expert AI Product Manager summarizing sprint work.
+Respond with a single valid JSON object (no markdown, no commentary) for the given sprint and items containing:
+- rt: 5 narrative steps describing the analysis performed
+- es: executive summary, up to 400 characters synthesizing outcomes and business impact
+- m: metrics object containing velocity, completion_rate, quality_score, customer_satisfaction, burndown_delta, scope_change
+- a: 5 achievement strings (<= 200 chars each)
+- b: up to 3 blocker strings (<= 180 chars)
+- nsr: 5 next sprint recommendation strings (<= 200 chars) with clear actions
+- su: array of 3 stakeholder update strings highlighting how to message leadership, product, and engineering stakeholders
+Keep language polished and data-driven."""
+_REPORT_TMPL = Template('sprint="$sprint_name", items=$items')
+_REPORT_KEYS = {
+    "rt": "reasoning_trace",
+    "es": "executive_summary",
+    "m": "metrics",
+    "a": "achievements",
+    "b": "blockers",
+    "nsr": "next_sprint_recommendations",
+    "su": "stakeholder_updates",
+}
+
+
+# Output schemas (short keys, matching the prompts above) for constrained decoding
+class ProductIdea(BaseModel):
+    name: str
+    description: str
+    key_features: List[str]
+    pain_points_addressed: List[int]
+
+
+class Persona(BaseModel):
+    name: str
+    role: str
+    goals: str
+    frustrations: str
+    motivations: str
+    preferred_channels: List[str]
+
+
+class MarketOpportunity(BaseModel):
+    tam: str
+    sam: str
+    som: str
+    cagr: str
+    strategic_insight: str
+
+
+class IdeationSchema(BaseModel):
+    rt: List[str]
+    pp: List[str]
+    pi: List[ProductIdea]
+    pe: List[Persona]
+    mo: MarketOpportunity
+
+
+class UserStory(BaseModel):
+    title: str
+    description: str
+    acceptance_criteria: List[str]
+    story_points: int
+    dependencies: List[str]
+    business_value: str
+    risks: str
+
+
+class RequirementsSchema(BaseModel):
+    rt: List[str]
+    us: List[UserStory]
+
+
+class SprintMetrics(BaseModel):
+    velocity: str
+    completion_rate: str
+    quality_score: str
+    customer_satisfaction: str
+    burndown_delta: str
+    scope_change: str
+
+
+class ReportSchema(BaseModel):
+    rt: List[str]
+    es: str
+    m: SprintMetrics
+    a: List[str]
+    b: List[str]
+    nsr: List[str]
+    su: List[str]
+
+
+_IDEATE_SCHEMA = IdeationSchema.model_json_schema()
+_REQUIREMENTS_SCHEMA = RequirementsSchema.model_json_schema()
+_REPORT_SCHEMA = ReportSchema.model_json_schema()
+
+
+class Workflow(NamedTuple):
+    system: str
+    template: Template
+    max_tokens: int
+    schema: Dict[str, Any]
+    keys: Dict[str, str]
+
+
+_WORKFLOWS = {
+    "ideation": Workflow(
+        system=_IDEATE_SYSTEM,
+        template=_IDEATE_TMPL,
+        max_tokens=2200,
+        schema=_IDEATE_SCHEMA,
+        keys=_IDEATE_KEYS,
+    ),
+    "requirements": Workflow(
+        system=_REQUIREMENTS_SYSTEM,
+        template=_REQUIREMENTS_TMPL,
+        max_tokens=2000,
+        schema=_REQUIREMENTS_SCHEMA,
+        keys=_REQUIREMENTS_KEYS,
+    ),
+    "reporting": Workflow(
+        system=_REPORT_SYSTEM,
+        template=_REPORT_TMPL,
+        max_tokens=2200,
+        schema=_REPORT_SCHEMA,
+        keys=_REPORT_KEYS,
+    ),
+}
+
+
+def _expand_keys(structured: Dict[str, Any], keys: Dict[str, str]) -> Dict[str, Any]:
+    """Maps short output keys back to public field names; unknown keys pass through."""
+    return {keys.get(k, k): v for k, v in structured.items()}
+
+
+# one session per process; the agent itself is a singleton
+_SESSION_ID = datetime.now().strftime("%Y%m%d_%H%M%S")
+_HISTORY_SIZE = 256
+_SESSION_CACHE_SIZE = 128
+_SESSION_TTL = 3600
+
+
 # agent class
 class GenVisAgent:
     """Main agent class managing workflows"""
     
     def __init__(self):
         self.state = {
-            "session_id": datetime.now().strftime("%Y%m%d_%H%M%S"),
-            "context": {},
-            "history": []
+            "session_id": _SESSION_ID,
+            # session_id -> {workflow: result}; only filled for callers that pass a
+            # session_id, and idle sessions expire so results aren't pinned forever
+            "context": TTLCache(maxsize=_SESSION_CACHE_SIZE, ttl=_SESSION_TTL),
+            # bounded so the long-lived singleton doesn't grow without limit
+            "history": deque(maxlen=_HISTORY_SIZE)
         }
     
-    def _update_state(self, workflow: str, data: Dict):
-        self.state["context"][workflow] = data
+    def _update_state(self, workflow: str, data: Dict, session_id: Optional[str] = None):
+        if session_id:
+            context = self.state["context"].get(session_id) or {}
+            self.state["context"][session_id] = {**context, workflow: data}
+        # history keeps a summary row only, not the (large) result itself
         self.state["history"].append({
             "timestamp": datetime.now().isoformat(),
             "workflow": workflow,
-            "data": data
+            "size": len(orjson.dumps(data))
         })
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.state["context"].get(session_id)
     
-    # ideation agent
-    def agent_ideate(self, industry: str, problem_area: str) -> Dict[str, Any]:
-        prompt = f"""
-You are GenVis, an AI Product Manager.
-Respond with a single valid JSON object (no markdown, no commentary) containing:
-- reasoning_trace: 5 detailed steps explaining how you approached the ideation (full sentences)
-- pain_points: exactly 3 richly written bullet strings (2–3 sentences each). Prefix each with its index like "1. ..."
-- product_ideas: exactly 3 objects with name, description (<= 420 chars, emphasize benefits), key_features (array of 4 strings), pain_points_addressed (array of indexes referencing pain_points, 1-indexed)
-- personas: 3 objects with name, role, goals, frustrations, motivations, preferred_channels
-- market_opportunity: object with tam, sam, som, cagr, strategic_insight (strings with context)
-Write professional, persuasive copy. Context: industry="{industry}", problem_area="{problem_area}".
-"""
-        ai_response = nemotron_generate(prompt, max_tokens=2200)
-        content = ai_response.get("content", "")
+    def _finish(self, workflow: str, content: str, session_id: Optional[str]) -> Dict[str, Any]:
         structured = _parse_structured_response(content)
+        # the workflows expect a JSON object; arrays/scalars are as unusable as no JSON
+        if not structured or not isinstance(structured, dict):
+            logger.error("Nemotron %s response was not valid JSON. Raw content: %s", workflow, content)
+            raise ValueError(f"Nemotron did not return valid JSON for {workflow} workflow.")
 
-        if not structured:
-            logger.error("Nemotron ideation response was not valid JSON. Raw content: %s", content)
-            raise ValueError("Nemotron did not return valid JSON for ideation workflow.")
+        structured = _expand_keys(structured, _WORKFLOWS[workflow].keys)
+        self._update_state(workflow, structured, session_id)
+        return structured
 
-        self._update_state("ideation", structured)
+    async def _run(self, workflow: str, session_id: Optional[str] = None, **ctx: str) -> Dict[str, Any]:
+        config = _WORKFLOWS[workflow]
+        prompt = config.template.substitute(**ctx)
+        key = _cache_key(config.system + prompt, config.max_tokens)
+        cached = _response_cache.get(key)
+        if cached is not None:
+            logger.info("Serving %s result from cache.", workflow)
+            self._update_state(workflow, cached, session_id)
+            return cached
+
+        ai_response = await nemotron_generate(
+            prompt, max_tokens=config.max_tokens, system=config.system, schema=config.schema
+        )
+        structured = self._finish(workflow, ai_response.get("content", ""), session_id)
+        _response_cache[key] = structured
         return structured
-    
-    # requirments agent
-    def agent_requirements(self, feature_name: str, target_persona: str) -> Dict[str, Any]:
-        prompt = f"""
-You are GenVis generating requirements.
-Respond with a single valid JSON object (no markdown, no commentary) for feature="{feature_name}" and persona="{target_persona}" including:
-- reasoning_trace: 5 concise but descriptive steps (full sentences)
-- user_stories: exactly 3 stories each containing title, description (<= 280 chars), acceptance_criteria (array of 4 bullet sentences), story_points (number), dependencies (array up to 3 items), business_value (string), risks (string)
-Keep content implementation-ready with clear detail.
-"""
-        ai_response = nemotron_generate(prompt, max_tokens=2000)
-        content = ai_response.get("content", "")
-        structured = _parse_structured_response(content)
 
-        if not structured:
-            logger.error("Nemotron requirements response was not valid JSON. Raw content: %s", content)
-            raise ValueError("Nemotron did not return valid JSON for requirements workflow.")
+    async def _stream(
+        self, workflow: str, session_id: Optional[str] = None, **ctx: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yields content deltas as they arrive, then the parsed result."""
+        config = _WORKFLOWS[workflow]
+        prompt = config.template.substitute(**ctx)
+        key = _cache_key(config.system + prompt, config.max_tokens)
+        cached = _response_cache.get(key)
+        if cached is not None:
+            self._update_state(workflow, cached, session_id)
+            yield {"type": "result", "data": cached}
+            return
+
+        parts = []
+        async for delta in nemotron_stream(
+            prompt, max_tokens=config.max_tokens, system=config.system, schema=config.schema
+        ):
+            parts.append(delta)
+            yield {"type": "delta", "content": delta}
+
+        structured = self._finish(workflow, "".join(parts).strip(), session_id)
+        _response_cache[key] = structured
+        yield {"type": "result", "data": structured}
 
-        self._update_state("requirements", structured)
-        return structured
+    # ideation agent
+    async def agent_ideate(
+        self, industry: str, problem_area: str, session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return await self._run("ideation", session_id, industry=industry, problem_area=problem_area)
 
-    # reporting agent
-    def agent_report(self, sprint_name: str, completed_items: List[str]) -> Dict[str, Any]:
-        prompt = f"""
-You are GenVis summarizing sprint work.
-Respond with a single valid JSON object (no markdown, no commentary) for sprint="{sprint_name}" with items={json.dumps(completed_items)} including:
-- reasoning_trace: 5 narrative steps describing the analysis performed
-- executive_summary: up to 400 characters synthesizing outcomes and business impact
-- metrics: object containing velocity, completion_rate, quality_score, customer_satisfaction, burndown_delta, scope_change
-- achievements: 5 bullet strings (<= 200 chars each)
-- blockers: up to 3 bullet strings (<= 180 chars)
-- next_sprint_recommendations: 5 bullet strings (<= 200 chars) with clear actions
-- stakeholder_updates: array of 3 strings highlighting how to message leadership, product, and engineering stakeholders
-Keep language polished and data-driven.
-"""
-        ai_response = nemotron_generate(prompt, max_tokens=2200)
-        content = ai_response.get("content", "")
-        structured = _parse_structured_response(content)
+    def stream_ideate(
+        self, industry: str, problem_area: str, session_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        return self._stream("ideation", session_id, industry=industry, problem_area=problem_area)
 
-        if not structured:
-            logger.error("Nemotron reporting response was not valid JSON. Raw content: %s", content)
-            raise ValueError("Nemotron did not return valid JSON for reporting workflow.")
+    # requirments agent
+    async def agent_requirements(
+        self, feature_name: str, target_persona: str, session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return await self._run(
+            "requirements", session_id, feature_name=feature_name, target_persona=target_persona
+        )
 
-        self._update_state("reporting", structured)
-        return structured
+    # reporting agent
+    async def agent_report(
+        self, sprint_name: str, completed_items: List[str], session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        items = orjson.dumps(completed_items).decode()
+        return await self._run("reporting", session_id, sprint_name=sprint_name, items=items)
+
+    # full pipeline (workflows are independent, so run them concurrently)
+    async def run_pipeline(
+        self,
+        industry: str,
+        problem_area: str,
+        feature_name: str,
+        target_persona: str,
+        sprint_name: str,
+        completed_items: List[str],
+        session_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        ideation, requirements, reporting = await asyncio.gather(
+            self.agent_ideate(industry, problem_area, session_id),
+            self.agent_requirements(feature_name, target_persona, session_id),
+            self.agent_report(sprint_name, completed_items, session_id),
+        )
+        return {"ideation": ideation, "requirements": requirements, "reporting": reporting}
 
 
 # singleton helper
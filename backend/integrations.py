@@ -3,13 +3,15 @@ import json
 import logging
 import os
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List
 
-import requests
 from dotenv import load_dotenv
 
 load_dotenv()
 
+if TYPE_CHECKING:
+    import requests
+
 logger = logging.getLogger(__name__)
 
 
@@ -84,7 +86,9 @@ class RealJiraClient:
             fields[self.story_points_field] = story_points
         return {"fields": fields}
 
-    def _post_issue(self, payload: Dict[str, Any]) -> requests.Response:
+    def _post_issue(self, payload: Dict[str, Any]) -> "requests.Response":
+        import requests
+
         return requests.post(
             f"{self.base_url}/rest/api/3/issue",
             headers=self.headers,
@@ -179,6 +183,8 @@ class RealSlackClient:
         self.webhook_url = SLACK_WEBHOOK_URL
 
     def send_sprint_summary(self, sprint_report: Dict[str, Any]) -> Dict[str, Any]:
+        import requests
+
         blocks = [
             {
                 "type": "header",
@@ -1,16 +1,26 @@
 import logging
+import threading
+import time
 from datetime import datetime, timezone
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
-from fastapi import FastAPI, HTTPException
+import orjson
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 
-from agent_backend import get_agent
+from agent_backend import (
+    NemotronUnavailableError,
+    close_http_client,
+    get_agent,
+    get_llm_stats,
+    warm_up_http_client,
+)
 from integrations import SLACK_CHANNEL, get_jira_client, get_slack_client
 
 logger = logging.getLogger(__name__)
-app = FastAPI(title="GenVis API", version="1.0.0")
+app = FastAPI(title="GenVis API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # CORS
 app.add_middleware(
@@ -25,19 +35,38 @@ app.add_middleware(
 class IdeationRequest(BaseModel):
     industry: str
     problem_area: str
+    session_id: Optional[str] = None
 
 class RequirementsRequest(BaseModel):
     feature_name: str
     target_persona: str
+    session_id: Optional[str] = None
 
 class ReportingRequest(BaseModel):
     sprint_name: str
     completed_items: List[str]
+    session_id: Optional[str] = None
+
+class PipelineRequest(BaseModel):
+    industry: str
+    problem_area: str
+    feature_name: str
+    target_persona: str
+    sprint_name: str
+    completed_items: List[str]
+    session_id: Optional[str] = None
 
 
 # === Activity cache & helpers ===
+# [epoch second, iso string]; activity timestamps only need 1s granularity
+_ts_cache: List[Any] = [0, ""]
+
+
 def _now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
+    now = int(time.time())
+    if _ts_cache[0] != now:
+        _ts_cache[:] = [now, datetime.fromtimestamp(now, timezone.utc).isoformat()]
+    return _ts_cache[1]
 
 
 def _count_items(value: Any) -> int:
@@ -72,34 +101,86 @@ _activity_state: Dict[str, Dict[str, Any]] = {
 }
 
 
+# Writers build a new state dict and rebind the module global (an atomic
+# pointer swap), so readers always see a complete snapshot without locking.
+# Writers do take a lock: sync routes write from the threadpool while async
+# routes write from the event loop, and two unlocked swaps could drop one.
+_activity_lock = threading.Lock()
+
+
+def _swap_activity(section: str, updates: Dict[str, Any]) -> None:
+    # caller must hold _activity_lock
+    global _activity_state
+    _activity_state = {**_activity_state, section: {**_activity_state[section], **updates}}
+
+
+def _replace_activity(section: str, **updates: Any) -> None:
+    with _activity_lock:
+        _swap_activity(section, updates)
+
+
+# (state dict, llm stats, encoded response); keyed on the state object itself,
+# so any copy-on-write replacement invalidates it, and on the LLM counters,
+# which only change when Nemotron is called
+_activity_response_cache: tuple = (None, None, b"")
+
+
+def _activity_response() -> bytes:
+    global _activity_response_cache
+    state = _activity_state
+    llm = get_llm_stats()
+    cached_state, cached_llm, cached_body = _activity_response_cache
+    if cached_state is not state or cached_llm != llm:
+        cached_body = orjson.dumps({"success": True, "data": {**state, "llm": llm}})
+        _activity_response_cache = (state, llm, cached_body)
+    return cached_body
+
+
 def _record_ideation_activity(payload: Dict[str, Any]) -> None:
-    insights = _activity_state["insights"]
-    insights["updated_at"] = _now_iso()
-    insights["pain_points"] = _count_items(payload.get("pain_points"))
-    insights["product_ideas"] = _count_items(payload.get("product_ideas"))
+    _replace_activity(
+        "insights",
+        updated_at=_now_iso(),
+        pain_points=_count_items(payload.get("pain_points")),
+        product_ideas=_count_items(payload.get("product_ideas")),
+    )
 
 
 def _record_requirements_activity(payload: Dict[str, Any]) -> None:
-    insights = _activity_state["insights"]
-    insights["updated_at"] = _now_iso()
-    insights["user_stories"] = _count_items(payload.get("user_stories"))
+    _replace_activity(
+        "insights",
+        updated_at=_now_iso(),
+        user_stories=_count_items(payload.get("user_stories")),
+    )
 
 
 def _record_reporting_activity(completed_count: int) -> None:
-    _activity_state["jira"]["completed_items"] = completed_count
+    _replace_activity("jira", completed_items=completed_count)
 
 
 def _record_jira_sync(created_count: int) -> None:
-    jira = _activity_state["jira"]
-    jira["last_sync"] = _now_iso()
-    jira["new_stories"] = created_count
-    jira["total_synced"] += created_count
+    with _activity_lock:
+        _swap_activity(
+            "jira",
+            {
+                "last_sync": _now_iso(),
+                "new_stories": created_count,
+                "total_synced": _activity_state["jira"]["total_synced"] + created_count,
+            },
+        )
 
 
 def _record_slack_activity(summary: str) -> None:
-    slack = _activity_state["slack"]
-    slack["last_post"] = _now_iso()
-    slack["last_summary"] = (summary or "")[:200]
+    _replace_activity("slack", last_post=_now_iso(), last_summary=(summary or "")[:200])
+
+
+@app.on_event("startup")
+async def _warm_up_http_client():
+    await warm_up_http_client()
+
+
+@app.on_event("shutdown")
+async def _shutdown_http_client():
+    await close_http_client()
 
 
 # Routes
@@ -109,34 +190,85 @@ def root():
 
 
 @app.post("/api/ideate")
-def ideate(request: IdeationRequest):
+async def ideate(request: IdeationRequest):
     try:
         agent = get_agent()
-        result = agent.agent_ideate(request.industry, request.problem_area)
+        result = await agent.agent_ideate(request.industry, request.problem_area, request.session_id)
         _record_ideation_activity(result)
         return {"success": True, "data": result}
+    except NemotronUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/ideate/stream")
+async def ideate_stream(request: IdeationRequest):
+    agent = get_agent()
+
+    async def events():
+        try:
+            async for event in agent.stream_ideate(
+                request.industry, request.problem_area, request.session_id
+            ):
+                if event["type"] == "result":
+                    _record_ideation_activity(event["data"])
+                yield orjson.dumps(event) + b"\n"
+        except Exception as e:
+            yield orjson.dumps({"type": "error", "detail": str(e)}) + b"\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 @app.post("/api/requirements")
-def requirements(request: RequirementsRequest):
+async def requirements(request: RequirementsRequest):
     try:
         agent = get_agent()
-        result = agent.agent_requirements(request.feature_name, request.target_persona)
+        result = await agent.agent_requirements(
+            request.feature_name, request.target_persona, request.session_id
+        )
         _record_requirements_activity(result)
         return {"success": True, "data": result}
+    except NemotronUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/report")
-def report(request: ReportingRequest):
+async def report(request: ReportingRequest):
     try:
         agent = get_agent()
-        result = agent.agent_report(request.sprint_name, request.completed_items)
+        result = await agent.agent_report(
+            request.sprint_name, request.completed_items, request.session_id
+        )
         _record_reporting_activity(len(request.completed_items or []))
         return {"success": True, "data": result}
+    except NemotronUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/pipeline")
+async def pipeline(request: PipelineRequest):
+    try:
+        agent = get_agent()
+        result = await agent.run_pipeline(
+            request.industry,
+            request.problem_area,
+            request.feature_name,
+            request.target_persona,
+            request.sprint_name,
+            request.completed_items,
+            request.session_id,
+        )
+        _record_ideation_activity(result["ideation"])
+        _record_requirements_activity(result["requirements"])
+        _record_reporting_activity(len(request.completed_items or []))
+        return {"success": True, "data": result}
+    except NemotronUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -165,13 +297,25 @@ def send_to_slack(sprint_report: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/sessions/{session_id}")
+async def get_session(session_id: str):
+    # async so it runs on the event loop with the writers; TTLCache reads
+    # reorder entries and aren't safe from the threadpool
+    context = get_agent().get_session(session_id)
+    if context is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"success": True, "data": context}
+
+
 @app.get("/api/activity")
 def get_activity():
-    return {"success": True, "data": _activity_state}
+    return Response(content=_activity_response(), media_type="application/json")
 
 
 if __name__ == "__main__":
     import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
     print("Starting GenVis API on http://localhost:8000")
     print("Docs available at http://localhost:8000/docs")
     uvicorn.run(app, host="0.0.0.0", port=8000)